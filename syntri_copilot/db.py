@@ -1,10 +1,15 @@
 # db.py
 import os
+import time
+import asyncio
+import logging
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 client = MongoClient(MONGO_URI)
 db = client['syntri']
+logger = logging.getLogger(__name__)
 
 # collections
 conversations = db['conversations']
@@ -13,3 +18,92 @@ media_inputs = db['media_inputs']
 risk_events = db['risk_events']
 action_tasks = db['action_tasks']
 voice_transcripts = db['voice_transcripts']
+
+# Write-behind buffer: webhook handlers queue documents here and
+# run_insert_flusher() writes them out with insert_many
+INSERT_BATCH_SIZE = 50
+INSERT_FLUSH_INTERVAL = 0.1  # seconds
+INSERT_RETRIES = 1
+INSERT_RETRY_DELAY = 0.5  # seconds
+
+_INSERT_QUEUE = {"financial_records": [], "conversations": [], "media_inputs": []}
+_batch_ready = asyncio.Event()
+
+def queue_insert(collection_name: str, doc: dict):
+    """
+    Buffer a document for the next batched insert into the given collection.
+    """
+    pending = _INSERT_QUEUE[collection_name]
+    pending.append(doc)
+    if len(pending) >= INSERT_BATCH_SIZE:
+        _batch_ready.set()
+
+def _drain_queue() -> dict:
+    """
+    Take ownership of everything currently buffered.
+    """
+    batches = {}
+    for name, pending in _INSERT_QUEUE.items():
+        if pending:
+            batches[name] = pending[:]
+            pending.clear()
+    return batches
+
+def _insert_with_retry(name: str, batch: list):
+    """
+    insert_many with a retry; the user has already been told the record
+    was saved, so a transient failure must not drop the batch.
+    """
+    for attempt in range(INSERT_RETRIES + 1):
+        try:
+            db[name].insert_many(batch, ordered=False)
+            return
+        except BulkWriteError as e:
+            # pymongo assigned every _id, so documents that did land would come
+            # back as duplicate-key errors; only resend the ones that failed
+            failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+            batch = [doc for i, doc in enumerate(batch) if i in failed]
+            if not batch:
+                return
+            if attempt == INSERT_RETRIES:
+                logger.exception("❌ Failed to flush %d %s records", len(batch), name)
+                return
+        except PyMongoError:
+            if attempt == INSERT_RETRIES:
+                logger.exception("❌ Failed to flush %d %s records", len(batch), name)
+                return
+        time.sleep(INSERT_RETRY_DELAY)
+
+def _write_batches(batches: dict):
+    for name, batch in batches.items():
+        try:
+            _insert_with_retry(name, batch)
+        except Exception:
+            # bson's InvalidDocument/DocumentTooLarge aren't PyMongoErrors;
+            # one bad collection must not cost the others their batch
+            logger.exception("❌ Failed to flush %d %s records", len(batch), name)
+
+async def flush_inserts():
+    """
+    Write all buffered documents now (pymongo runs in a worker thread).
+    """
+    batches = _drain_queue()
+    if batches:
+        await asyncio.to_thread(_write_batches, batches)
+
+async def run_insert_flusher():
+    """
+    Background task: flush every INSERT_FLUSH_INTERVAL or as soon as a
+    collection has INSERT_BATCH_SIZE documents waiting.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(_batch_ready.wait(), timeout=INSERT_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _batch_ready.clear()
+        try:
+            await flush_inserts()
+        except Exception:
+            # Keep the flusher alive; queued records would otherwise pile up unwritten
+            logger.exception("❌ Insert flush failed")
@@ -1,21 +1,50 @@
 # main.py
 import os
-import traceback
+import re
+import asyncio
+import logging
+import calendar
+from functools import lru_cache
 from fastapi import FastAPI, Request, BackgroundTasks, HTTPException
 from fastapi.responses import Response
 from datetime import datetime
-from db import db, financial_records, conversations, media_inputs
+from dateutil.relativedelta import relativedelta
+from db import db, queue_insert, run_insert_flusher, flush_inserts
 from parser import parse_text_message, extract_amount_from_query
-from ocr import download_media, image_bytes_to_text, validate_image
+from ocr import download_media, image_bytes_to_text, close_http_client
 from senders import send_whatsapp
 from forecast import (
     compute_weekly_insights, simulate_hire, simulate_sales_change, 
     compute_monthly_totals, last_n_months_average_monthly_net, highest_sales_week
 )
-from watsonx_client import polish_text_with_fallback
+from watsonx_client import polish_text_with_fallback, close_watsonx_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Syntri WhatsApp Financial Bot")
 
+_insert_flusher_task = None
+
+@app.on_event("startup")
+async def start_insert_flusher():
+    """
+    Start the background task that batches MongoDB inserts.
+    """
+    global _insert_flusher_task
+    _insert_flusher_task = asyncio.create_task(run_insert_flusher())
+
+@app.on_event("shutdown")
+async def stop_insert_flusher():
+    """
+    Stop the flusher and write out anything still buffered.
+    """
+    if _insert_flusher_task:
+        _insert_flusher_task.cancel()
+    await flush_inserts()
+    await close_http_client()
+    await close_watsonx_client()
+
 # Enhanced query keywords for better detection
 QUERY_KEYWORDS = [
     "how am i doing", "this week", "last week", "total sales", "total expenses", "net profit",
@@ -26,15 +55,101 @@ QUERY_KEYWORDS = [
     "weekly report", "monthly report", "summary", "overview"
 ]
 
+INGEST_LEADING_CHARS = frozenset("0123456789₹$")
+QUERY_LEADING_WORDS = ("how ", "what ", "when ", "why ", "which ")
+
+_HAS_AMOUNT_RE = re.compile(r'[\d₹$]')
+_NUM_RE = re.compile(r'(?P<val>-?\d+(?:\.\d+)?)\s*(?P<pct>%)?')
+
+MONTH_MAP = {
+    "january": 1, "february": 2, "march": 3, "april": 4,
+    "may": 5, "june": 6, "july": 7, "august": 8,
+    "september": 9, "october": 10, "november": 11, "december": 12
+}
+
+MONTH_ABBR = tuple(calendar.month_abbr)
+
+_TRIE_END = ""
+
+def _build_trie(words: dict) -> dict:
+    """
+    Build a nested-dict trie; terminal nodes store the word's value under _TRIE_END.
+    """
+    root = {}
+    for word, value in words.items():
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[_TRIE_END] = (word, value)
+    return root
+
+_MONTH_TRIE = _build_trie(MONTH_MAP)
+
+def find_month(text_lower: str):
+    """
+    Walk the month trie over each word in the text (single O(len) pass).
+    Returns (month_name, month_number, year_or_None) for the first month found, else None.
+    """
+    n = len(text_lower)
+    i = 0
+    while i < n:
+        # Only start a walk at the beginning of a word
+        if i and text_lower[i - 1].isalpha():
+            i += 1
+            continue
+        
+        node = _MONTH_TRIE
+        j = i
+        while j < n and text_lower[j] in node:
+            node = node[text_lower[j]]
+            j += 1
+        
+        if _TRIE_END in node and (j == n or not text_lower[j].isalpha()):
+            month_name, month = node[_TRIE_END]
+            
+            # Optional 4-digit year after the month name
+            k = j
+            while k < n and text_lower[k].isspace():
+                k += 1
+            year_str = text_lower[k:k + 4]
+            year = None
+            if len(year_str) == 4 and year_str.isdigit() and not text_lower[k + 4:k + 5].isdigit():
+                year = int(year_str)
+            return month_name, month, year
+        
+        i += 1
+    
+    return None
+
+def find_number(text: str):
+    """
+    Single scan for numbers; returns the first percentage if there is one,
+    otherwise the first plain number (or None).
+    """
+    first = None
+    for match in _NUM_RE.finditer(text):
+        if match.group("pct"):
+            return match
+        if first is None:
+            first = match
+    return first
+
+@lru_cache(maxsize=4096)
 def is_query(text: str) -> bool:
     """
     Enhanced query detection with better heuristics.
+    Pure on its input, so repeated phrasings are served from the LRU cache.
     """
     if not text:
         return False
     
     text_lower = text.lower().strip()
     
+    # Fast path keyed on the first character: question words are queries
+    first = text_lower[:1]
+    if first == "?" or text_lower.startswith(QUERY_LEADING_WORDS):
+        return True
+    
     # Explicit query indicators
     query_indicators = [
         "?", "how", "what", "when", "where", "why", "which", "tell me", 
@@ -59,10 +174,15 @@ def is_query(text: str) -> bool:
     if any(pattern in text_lower for pattern in analytical_patterns):
         return True
     
+    # Text that leads with an amount has one, so the amount-free checks
+    # below can't match; with no query words found it is an ingestion
+    if first in INGEST_LEADING_CHARS:
+        return False
+    
     # Check for time-based queries without amounts
     time_patterns = ["this week", "last week", "this month", "last month"]
     has_time_pattern = any(pattern in text_lower for pattern in time_patterns)
-    has_amount = any(char.isdigit() for char in text_lower) or "₹" in text_lower
+    has_amount = _HAS_AMOUNT_RE.search(text) is not None
     
     if has_time_pattern and not has_amount:
         return True
@@ -79,7 +199,7 @@ def log_conversation(user_from: str, incoming_text: str, reply_text: str, meta:
     Log conversation with enhanced metadata.
     """
     try:
-        conversations.insert_one({
+        queue_insert("conversations", {
             "from": user_from,
             "incoming": incoming_text,
             "reply": reply_text,
@@ -94,8 +214,9 @@ def format_basic_insight(ins: dict) -> str:
     """
     Format weekly insights with better readability.
     """
-    week_start = ins['week_start'].strftime("%b %d")
-    week_end = ins['week_end'].strftime("%b %d")
+    start, end = ins['week_start'], ins['week_end']
+    week_start = f"{MONTH_ABBR[start.month]} {start.day:02d}"
+    week_end = f"{MONTH_ABBR[end.month]} {end.day:02d}"
     
     return (f"📊 Week {week_start} - {week_end}\n"
            f"💰 Sales: ₹{ins['total_sales']:,.2f}\n"
@@ -131,17 +252,13 @@ async def process_image_message(form_data: dict):
         print(f"📋 Content Type: {content_type}")
         
         # Download media
-        image_bytes = download_media(media_url)
+        image_bytes = await download_media(media_url)
         
-        # Validate image
-        if not validate_image(image_bytes):
-            raise ValueError("Invalid image format")
-        
-        # Extract text using OCR
+        # Extract text using OCR (raises on invalid image data)
         extracted_text = image_bytes_to_text(image_bytes)
         
         # Log media input
-        media_inputs.insert_one({
+        queue_insert("media_inputs", {
             "from": from_number,
             "media_url": media_url,
             "content_type": content_type,
@@ -154,29 +271,28 @@ async def process_image_message(form_data: dict):
         parsed_data = parse_text_message(extracted_text, source="photo")
         
         # Store the financial record
-        financial_records.insert_one(parsed_data)
+        queue_insert("financial_records", parsed_data.to_dict())
         
         # Send confirmation with extracted details
-        amount_str = f"₹{parsed_data['amount']:,.2f}" if parsed_data['amount'] else "No amount detected"
+        amount_str = f"₹{parsed_data.amount:,.2f}" if parsed_data.amount else "No amount detected"
         success_message = (f"✅ Image processed successfully!\n"
                          f"📝 Extracted: {extracted_text[:100]}...\n"
                          f"💰 Amount: {amount_str}\n"
-                         f"🏷️ Type: {parsed_data['type'].title()}")
+                         f"🏷️ Type: {parsed_data.type.title()}")
         
         safe_send_message(from_number, success_message, {
             "type": "ingest", 
             "source": "photo", 
             "extracted_text": extracted_text,
-            "parsed_amount": parsed_data['amount']
+            "parsed_amount": parsed_data.amount
         })
         
     except Exception as e:
-        print(f"❌ Image processing error: {e}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("❌ Image processing error: %s", e)
         
         # Log the failed attempt
         try:
-            media_inputs.insert_one({
+            queue_insert("media_inputs", {
                 "from": from_number,
                 "media_url": media_url,
                 "content_type": content_type,
@@ -210,7 +326,7 @@ async def process_text_query(from_number: str, text: str):
         if "this week" in text_lower or "how am i doing" in text_lower:
             insights = compute_weekly_insights(db=db)
             raw_reply = format_basic_insight(insights)
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "weekly_insight"
             })
@@ -218,32 +334,20 @@ async def process_text_query(from_number: str, text: str):
 
         # Last week insights
         if "last week" in text_lower:
-            from dateutil.relativedelta import relativedelta
             target = datetime.utcnow() - relativedelta(weeks=1)
             insights = compute_weekly_insights(db=db, target_date=target)
             raw_reply = format_basic_insight(insights)
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "last_week"
             })
             return
 
         # Monthly queries
-        import re
-        month_match = re.search(
-            r'(january|february|march|april|may|june|july|august|september|october|november|december)\s*(\d{4})?', 
-            text_lower
-        )
+        month_match = find_month(text_lower)
         if month_match:
-            month_name = month_match.group(1)
-            year = int(month_match.group(2)) if month_match.group(2) else datetime.utcnow().year
-            
-            month_map = {
-                "january": 1, "february": 2, "march": 3, "april": 4,
-                "may": 5, "june": 6, "july": 7, "august": 8,
-                "september": 9, "october": 10, "november": 11, "december": 12
-            }
-            month = month_map[month_name]
+            month_name, month, year = month_match
+            year = year or datetime.utcnow().year
             
             totals = compute_monthly_totals(db=db, year=year, month=month)
             raw_reply = (f"📅 {month_name.title()} {year} Summary:\n"
@@ -251,7 +355,7 @@ async def process_text_query(from_number: str, text: str):
                         f"💸 Expenses: ₹{totals['expenses']:,.2f}\n"
                         f"📈 Net Profit: ₹{totals['net']:,.2f}")
             
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "monthly", "year": year, "month": month
             })
@@ -269,7 +373,7 @@ async def process_text_query(from_number: str, text: str):
                 lines.append(f"Month {proj['month']}: ₹{proj['projected_net_after_salary']:,.2f}")
             
             raw_reply = "\n".join(lines)
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "hire", "salary": salary
             })
@@ -278,10 +382,10 @@ async def process_text_query(from_number: str, text: str):
         # Sales change simulation
         if "sales" in text_lower and ("drop" in text_lower or "increase" in text_lower or "%" in text):
             pct = 0.0
-            pct_match = re.search(r'(-?\d+(?:\.\d+)?)\s*%?', text)
+            pct_match = find_number(text)
             if pct_match:
                 try:
-                    pct_val = float(pct_match.group(1))
+                    pct_val = float(pct_match.group("val"))
                     pct = -abs(pct_val)/100.0 if "drop" in text_lower or "decrease" in text_lower else abs(pct_val)/100.0
                 except:
                     pct = 0.0
@@ -292,7 +396,7 @@ async def process_text_query(from_number: str, text: str):
                         f"📊 Base monthly net: ₹{simulation['base_monthly_net']:,.2f}\n"
                         f"📅 Month 1 projection: ₹{simulation['projection'][0]['projected_net']:,.2f}")
             
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "sales_change", "pct": pct
             })
@@ -308,7 +412,7 @@ async def process_text_query(from_number: str, text: str):
                            f"📅 Year {highest['year']}, Week {highest['week']}\n"
                            f"💰 Sales: ₹{highest['sales']:,.2f}")
             
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "highest_sales"
             })
@@ -328,7 +432,7 @@ async def process_text_query(from_number: str, text: str):
                         f"₹{current_month['net']:,.2f} net\n"
                         f"📈 3-month avg net: ₹{avg_net:,.2f}")
             
-            polished = polish_text_with_fallback(raw_reply)
+            polished = await asyncio.to_thread(polish_text_with_fallback, raw_reply)
             safe_send_message(from_number, polished, {
                 "type": "query", "subtype": "summary"
             })
@@ -343,14 +447,13 @@ async def process_text_query(from_number: str, text: str):
                            "• 'Highest sales week'\n"
                            "• Or send a bill/receipt image")
         
-        polished = polish_text_with_fallback(fallback_message)
+        polished = await asyncio.to_thread(polish_text_with_fallback, fallback_message)
         safe_send_message(from_number, polished, {
             "type": "query", "subtype": "fallback"
         })
 
     except Exception as e:
-        print(f"❌ Query processing error: {e}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("❌ Query processing error: %s", e)
         
         error_message = ("⚠️ Sorry, I encountered an error processing your query.\n"
                         "Please try again or rephrase your question.")
@@ -364,13 +467,13 @@ async def process_text_ingestion(from_number: str, text: str):
     """
     try:
         parsed_data = parse_text_message(text, source="text")
-        financial_records.insert_one(parsed_data)
+        queue_insert("financial_records", parsed_data.to_dict())
         
         # Enhanced confirmation message
-        amount_str = f"₹{parsed_data['amount']:,.2f}" if parsed_data['amount'] else "Amount not detected"
+        amount_str = f"₹{parsed_data.amount:,.2f}" if parsed_data.amount else "Amount not detected"
         confirmation = (f"✅ Record added!\n"
                        f"💰 {amount_str}\n"
-                       f"🏷️ {parsed_data['type'].title()}: {parsed_data['category']}")
+                       f"🏷️ {parsed_data.type.title()}: {parsed_data.category}")
         
         safe_send_message(from_number, confirmation, {
             "type": "ingest", "source": "text"
@@ -430,8 +533,7 @@ async def twilio_webhook(request: Request, background_tasks: BackgroundTasks):
         return Response(content="OK", status_code=200)
         
     except Exception as e:
-        print(f"❌ Webhook error: {e}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("❌ Webhook error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/health")
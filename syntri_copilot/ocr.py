@@ -1,11 +1,9 @@
 # ocr.py
 import os
-import requests
+import httpx
 from io import BytesIO
 from PIL import Image
-import pytesseract
 import numpy as np
-import cv2
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,7 +11,32 @@ load_dotenv()
 TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 
-def download_media(url: str) -> bytes:
+# OpenCV and pytesseract are imported on the first image (see _lazy_init)
+# so they stay off the import path of every worker at startup
+cv2 = None
+pytesseract = None
+
+def _lazy_init():
+    """
+    Import the heavy OCR dependencies on first use.
+    """
+    global cv2, pytesseract
+    if cv2 is None:
+        import cv2 as _cv2
+        import pytesseract as _pytesseract
+        cv2, pytesseract = _cv2, _pytesseract
+
+# Long-lived client so Twilio media downloads reuse pooled keep-alive connections
+_HTTPX = httpx.AsyncClient(
+    http2=True,
+    auth=(TWILIO_SID, TWILIO_TOKEN) if TWILIO_SID and TWILIO_TOKEN else None,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=20),
+    headers={'User-Agent': 'Syntri-WhatsApp-Bot/1.0'},
+    follow_redirects=True
+)
+
+async def download_media(url: str) -> bytes:
     """
     Download media from Twilio with proper authentication.
     """
@@ -21,13 +44,8 @@ def download_media(url: str) -> bytes:
         raise ValueError("Twilio credentials not found in environment variables")
     
     try:
-        # Twilio media URLs require HTTP Basic Auth
-        response = requests.get(
-            url, 
-            auth=(TWILIO_SID, TWILIO_TOKEN), 
-            timeout=30,
-            headers={'User-Agent': 'Syntri-WhatsApp-Bot/1.0'}
-        )
+        # Twilio media URLs require HTTP Basic Auth (set on the client)
+        response = await _HTTPX.get(url)
         response.raise_for_status()
         
         if len(response.content) == 0:
@@ -36,17 +54,25 @@ def download_media(url: str) -> bytes:
         print(f"✅ Downloaded media: {len(response.content)} bytes")
         return response.content
         
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise Exception("Timeout while downloading media from Twilio")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Failed to download media: {str(e)}")
     except Exception as e:
         raise Exception(f"Unexpected error downloading media: {str(e)}")
 
+async def close_http_client():
+    """
+    Close the pooled media download client.
+    """
+    await _HTTPX.aclose()
+
 def preprocess_for_ocr(pil_image: Image.Image) -> np.ndarray:
     """
     Preprocess image for better OCR results.
     """
+    _lazy_init()
+    
     try:
         # Convert to RGB if not already
         if pil_image.mode != 'RGB':
@@ -85,15 +111,12 @@ def image_bytes_to_text(image_bytes: bytes) -> str:
     if not image_bytes:
         raise ValueError("Image bytes is empty")
     
+    _lazy_init()
+    
     try:
-        # Open image from bytes
-        pil_image = Image.open(BytesIO(image_bytes))
-        
-        # Check if image is valid
-        pil_image.verify()
-        
-        # Reopen image (verify() closes it)
+        # Open and decode image from bytes (load() raises on corrupt data)
         pil_image = Image.open(BytesIO(image_bytes))
+        pil_image.load()
         
         print(f"📷 Processing image: {pil_image.size}, mode: {pil_image.mode}")
         
@@ -121,10 +144,11 @@ def image_bytes_to_text(image_bytes: bytes) -> str:
                     output_type=pytesseract.Output.DICT
                 )
                 
-                # Calculate average confidence
-                confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                if confidences:
-                    avg_confidence = sum(confidences) / len(confidences)
+                # Calculate average confidence over recognised words
+                confidences = np.asarray(data['conf'], dtype=np.float64)
+                confidences = confidences[confidences > 0]
+                if confidences.size:
+                    avg_confidence = float(confidences.mean())
                     
                     if avg_confidence > max_confidence:
                         max_confidence = avg_confidence
@@ -159,15 +183,4 @@ def image_bytes_to_text(image_bytes: bytes) -> str:
         return best_text
         
     except Exception as e:
-        raise Exception(f"OCR processing failed: {str(e)}")
-
-def validate_image(image_bytes: bytes) -> bool:
-    """
-    Validate if the image bytes represent a valid image.
-    """
-    try:
-        img = Image.open(BytesIO(image_bytes))
-        img.verify()
-        return True
-    except Exception:
-        return False
\ No newline at end of file
+        raise Exception(f"OCR processing failed: {str(e)}")
\ No newline at end of file
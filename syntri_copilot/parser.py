@@ -1,12 +1,21 @@
 # parser.py
 import re
 from dateutil import parser as dtparser
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from dataclasses import dataclass
+from datetime import datetime, timedelta, date
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
 import logging
 
+# PCRE2 with JIT (PyPcre) compiles the hot amount/date scanners to native code;
+# its API mirrors `re`, so fall back to the stdlib engine when it isn't installed
+try:
+    import pcre as regex_engine
+except ImportError:
+    regex_engine = re
+
 # Enhanced amount detection patterns
-AMOUNT_PATTERNS = [
+_AMOUNT_PATTERN_SOURCES = [
     r'₹\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # ₹1,000.00
     r'INR\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # INR 1000
     r'Rs\.?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Rs. 1000
@@ -16,6 +25,20 @@ AMOUNT_PATTERNS = [
     r'(\d+(?:,\d{3})*(?:\.\d{2})?)',  # Simple number pattern (last resort)
 ]
 
+def _alternation(sources: List[str]) -> str:
+    """
+    Join single-group patterns into one alternation so the text is scanned once.
+    Each source has exactly one capturing group, so match.lastindex - 1 is the
+    index (priority) of the pattern that matched.
+    """
+    return "|".join(f"(?:{p})" for p in sources)
+
+# Compiled once at import; extract_amount runs on every inbound message.
+# The bare-number pattern stays last so currency-specific hits win. Each
+# pattern keeps its own scan: in a fused alternation a lower-priority match
+# can consume the text (e.g. the "₹") a higher-priority one needed.
+AMOUNT_PATTERNS = [regex_engine.compile(p, regex_engine.I) for p in _AMOUNT_PATTERN_SOURCES]
+
 # Enhanced category keywords with more specific patterns
 CATEGORY_KEYWORDS = {
     "supplier_payment": [
@@ -81,8 +104,29 @@ TYPE_INDICATORS = {
     ]
 }
 
+# Number words for amounts written out (e.g., "five thousand")
+WORD_TO_NUM = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
+    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
+    'eighty': 80, 'ninety': 90, 'hundred': 100, 'thousand': 1000,
+    'lakh': 100000, 'crore': 10000000
+}
+
+AMOUNT_MULTIPLIERS = {
+    'hundred': 100, 'hundreds': 100,
+    'thousand': 1000, 'thousands': 1000,
+    'lakh': 100000, 'lakhs': 100000,
+    'crore': 10000000, 'crores': 10000000
+}
+# Which multiplier wins when several appear ("one hundred thousand" is
+# hundred x thousand, not one x hundred)
+_MULTIPLIER_PRIORITY = (1000, 100, 100000, 10000000)
+
 # Date patterns for better extraction
-DATE_PATTERNS = [
+_DATE_PATTERN_SOURCES = [
     r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # DD/MM/YYYY or DD-MM-YYYY
     r'(\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{2,4})',  # DD Month YYYY
     r'((?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{1,2},?\s+\d{2,4})',  # Month DD, YYYY
@@ -90,78 +134,112 @@ DATE_PATTERNS = [
     r'(\d{1,2}\s+(?:days?|weeks?)\s+ago)',  # X days ago
 ]
 
-def extract_amount(text: str) -> Optional[float]:
+# Zero-width lookahead at each word start so a junk match ("00 Aug 10" inside
+# "3000 Aug 10, 2025") cannot consume text a later pattern needs
+DATE_RE = regex_engine.compile(rf"\b(?={_alternation(_DATE_PATTERN_SOURCES)})", regex_engine.I)
+DAYS_AGO_RE = re.compile(r'(\d+)\s+days?\s+ago')
+
+# strptime formats for the shape each DATE pattern matches (same order);
+# dateutil's fuzzy parser is only used when none of them fit
+DATE_FORMATS = [
+    ("%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y"),
+    ("%d %b %Y", "%d %B %Y", "%d %b %y", "%d %B %y"),
+    ("%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y",
+     "%b %d, %y", "%B %d, %y", "%b %d %y", "%B %d %y"),
+    (),
+    (),
+]
+
+def _parse_date_match(match: str, formats: tuple) -> datetime:
+    """
+    Parse a DATE pattern match with its known formats, falling back to dateutil.
+    """
+    for fmt in formats:
+        try:
+            return datetime.strptime(match, fmt)
+        except ValueError:
+            continue
+    return dtparser.parse(match, fuzzy=True, dayfirst=True)
+
+_DIGIT_RE = re.compile(r'\d')
+_MONTH_NAME_RE = re.compile(r'\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)')
+
+# Query shorthands ("15k", "1.5L", "2C")
+_K_RE = re.compile(r'(\d+(?:\.\d+)?)\s*k')
+_L_RE = re.compile(r'(\d+(?:\.\d+)?)\s*l')
+_C_RE = re.compile(r'(\d+(?:\.\d+)?)\s*c')
+
+def clean_text(text: str) -> str:
+    """
+    Normalize narrow no-break spaces and surrounding whitespace.
+    """
+    return text.replace("\u202f", " ").strip()
+
+def extract_amount(text: str, text_clean: Optional[str] = None, text_lower: Optional[str] = None) -> Optional[float]:
     """
     Enhanced amount extraction with multiple pattern matching.
+    Pass text_clean/text_lower when the caller has already computed them.
     """
     if not text:
         return None
     
     # Clean up the text
-    text = text.replace("\u202f", " ").replace("₹", "₹").strip()
+    text = text_clean if text_clean is not None else clean_text(text)
+    
+    # Every numeric pattern needs a digit; skip straight to word amounts
+    if not _DIGIT_RE.search(text):
+        return extract_amount_from_words(text, text_lower)
     
-    # Try each pattern in order of specificity
+    # Try each pattern in order of specificity, stopping at the first
+    # valid match instead of collecting them all
     for pattern in AMOUNT_PATTERNS:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            for match in matches:
-                try:
-                    # Clean the matched amount
-                    amount_str = str(match).replace(",", "").strip()
-                    amount = float(amount_str)
-                    
-                    # Validate the amount (reasonable business range)
-                    if 0 < amount <= 10000000:  # Up to 1 crore
-                        return amount
-                        
-                except (ValueError, TypeError):
-                    continue
+        for match in pattern.finditer(text):
+            try:
+                # Clean the matched amount
+                amount = float(match.group(1).replace(",", ""))
+            except (ValueError, TypeError):
+                continue
+            
+            # Validate the amount (reasonable business range)
+            if 0 < amount <= 10000000:  # Up to 1 crore
+                return amount
     
     # Try to extract from words (e.g., "five thousand")
-    word_amount = extract_amount_from_words(text)
+    word_amount = extract_amount_from_words(text, text_lower)
     if word_amount:
         return word_amount
     
     return None
 
-def extract_amount_from_words(text: str) -> Optional[float]:
+def extract_amount_from_words(text: str, text_lower: Optional[str] = None) -> Optional[float]:
     """
     Extract amounts written in words (e.g., "five thousand").
     """
     if not text:
         return None
     
-    text_lower = text.lower()
-    
-    # Number words mapping
-    word_to_num = {
-        'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-        'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-        'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
-        'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
-        'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
-        'eighty': 80, 'ninety': 90, 'hundred': 100, 'thousand': 1000,
-        'lakh': 100000, 'crore': 10000000
-    }
-    
-    # Simple patterns for common amounts
-    patterns = [
-        (r'(\w+)\s+thousand', lambda m: word_to_num.get(m.group(1), 0) * 1000),
-        (r'(\w+)\s+hundred', lambda m: word_to_num.get(m.group(1), 0) * 100),
-        (r'(\w+)\s+lakh', lambda m: word_to_num.get(m.group(1), 0) * 100000),
-    ]
-    
-    for pattern, converter in patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            try:
-                return converter(match)
-            except:
-                continue
+    if text_lower is None:
+        text_lower = text.lower()
+    
+    # Note the word right before the first occurrence of each multiplier
+    # ("rent, thousand" has none: punctuation separates them)
+    tokens = text_lower.split()
+    preceding = {}
+    for i in range(1, len(tokens)):
+        multiplier = AMOUNT_MULTIPLIERS.get(tokens[i].rstrip(".,!?;:"))
+        if multiplier and multiplier not in preceding and tokens[i - 1][-1].isalnum():
+            preceding[multiplier] = tokens[i - 1]
+    
+    # The highest-priority multiplier present decides the amount
+    for multiplier in _MULTIPLIER_PRIORITY:
+        if multiplier in preceding:
+            amount = WORD_TO_NUM.get(preceding[multiplier], 0) * multiplier
+            # Validate the amount (reasonable business range)
+            return amount if 0 < amount <= 10000000 else None  # Up to 1 crore
     
     return None
 
-def extract_date(text: str) -> Optional[datetime]:
+def extract_date(text: str, text_lower: Optional[str] = None) -> Optional[datetime]:
     """
     Enhanced date extraction with multiple strategies.
     """
@@ -169,40 +247,51 @@ def extract_date(text: str) -> Optional[datetime]:
         return None
     
     # Handle relative dates first
-    text_lower = text.lower()
+    if text_lower is None:
+        text_lower = text.lower()
     now = datetime.now()
     
+    # Validation window (not too far in future or past), computed once
+    min_date = now - timedelta(days=365*2)
+    max_date = now + timedelta(days=30)
+    
     if 'today' in text_lower:
         return now.replace(hour=0, minute=0, second=0, microsecond=0)
     elif 'yesterday' in text_lower:
         return (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
     
     # Handle "X days ago" patterns
-    days_ago_match = re.search(r'(\d+)\s+days?\s+ago', text_lower)
-    if days_ago_match:
-        days = int(days_ago_match.group(1))
-        return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Try specific date patterns
-    for pattern in DATE_PATTERNS:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                parsed_date = dtparser.parse(match, fuzzy=True, dayfirst=True)
+    if 'ago' in text_lower:
+        days_ago_match = DAYS_AGO_RE.search(text_lower)
+        if days_ago_match:
+            days = int(days_ago_match.group(1))
+            return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # Try specific date patterns (one scan, then in pattern-priority order)
+    candidates = sorted(
+        ((m.lastindex - 1, m.start(), m.group(m.lastindex)) for m in DATE_RE.finditer(text)),
+        key=lambda c: c[:2]
+    )
+    for rank, _, match in candidates:
+        try:
+            parsed_date = _parse_date_match(match, DATE_FORMATS[rank])
+            
+            if min_date <= parsed_date <= max_date:
+                return parsed_date
                 
-                # Validate date (not too far in future or past)
-                if (now - timedelta(days=365*2)) <= parsed_date <= (now + timedelta(days=30)):
-                    return parsed_date
-                    
-            except (ValueError, TypeError):
-                continue
+        except (ValueError, TypeError):
+            continue
+    
+    # Fallback to fuzzy parsing on the entire text; skip it when there is
+    # nothing date-like (no digit, no month name) for it to find
+    if not (_DIGIT_RE.search(text) or _MONTH_NAME_RE.search(text_lower)):
+        return None
     
-    # Fallback to fuzzy parsing on the entire text
     try:
         parsed_date = dtparser.parse(text, fuzzy=True, dayfirst=True)
         
         # Validate date
-        if (now - timedelta(days=365*2)) <= parsed_date <= (now + timedelta(days=30)):
+        if min_date <= parsed_date <= max_date:
             return parsed_date
             
     except (ValueError, TypeError):
@@ -210,51 +299,63 @@ def extract_date(text: str) -> Optional[datetime]:
     
     return None
 
-def detect_category(text: str) -> str:
+# Flat lookup tables built once at import (instead of walking the dict-of-lists
+# per message): keyword -> (category, weight) and indicator -> type. Weight is
+# the word count, so more specific keywords score higher. Entries stay grouped
+# by category, in CATEGORY_KEYWORDS order.
+_KW_INDEX: Dict[str, Tuple[str, int]] = {
+    keyword: (category, len(keyword.split()))
+    for category, keywords in CATEGORY_KEYWORDS.items()
+    for keyword in keywords
+}
+_TYPE_INDEX: Dict[str, str] = {
+    indicator: transaction_type
+    for transaction_type, indicators in TYPE_INDICATORS.items()
+    for indicator in indicators
+}
+
+# Categories that imply money going out
+EXPENSE_CATEGORIES = frozenset({"supplier_payment", "salary", "diesel", "grocery", "utilities", "rent"})
+
+def _score_category(text_lower: str) -> str:
     """
-    Enhanced category detection with weighted scoring.
+    Pick the best-scoring category for already-lowercased text.
     """
-    if not text:
-        return "uncategorized"
-    
-    text_lower = text.lower()
-    category_scores = {}
-    
-    # Score each category based on keyword matches
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        score = 0
-        for keyword in keywords:
-            if keyword in text_lower:
-                # Give higher scores to more specific keywords
-                score += len(keyword.split())
-        
-        if score > 0:
-            category_scores[category] = score
-    
-    # Return the category with the highest score
-    if category_scores:
-        return max(category_scores, key=category_scores.get)
-    
-    return "uncategorized"
+    best_category, best_score = None, 0
+    current_category, score = None, 0
+    
+    # Score each category based on keyword matches. The index is grouped by
+    # category, so a category's total is final when the next one starts;
+    # strict > lets the first category win ties, as max() did
+    for keyword, (category, weight) in _KW_INDEX.items():
+        if category != current_category:
+            if score > best_score:
+                best_category, best_score = current_category, score
+            current_category, score = category, 0
+        if keyword in text_lower:
+            score += weight
+    
+    if score > best_score:
+        best_category = current_category
+    
+    return best_category or "uncategorized"
 
-def detect_type(text: str) -> str:
+def _score_type(text_lower: str, category: str) -> str:
     """
-    Enhanced transaction type detection.
+    Pick the transaction type for already-lowercased text, reusing its
+    detected category instead of scanning the keywords again.
     """
-    if not text:
-        return "unknown"
-    
-    text_lower = text.lower()
-    
     # Score each type based on indicators
-    expense_score = sum(1 for indicator in TYPE_INDICATORS["expense"] if indicator in text_lower)
-    sale_score = sum(1 for indicator in TYPE_INDICATORS["sale"] if indicator in text_lower)
+    type_scores = {"expense": 0, "sale": 0}
+    for indicator, transaction_type in _TYPE_INDEX.items():
+        if indicator in text_lower:
+            type_scores[transaction_type] += 1
+    expense_score, sale_score = type_scores["expense"], type_scores["sale"]
     
     # Check category for additional hints
-    category = detect_category(text)
     if category == "sale":
         sale_score += 2
-    elif category in ["supplier_payment", "salary", "diesel", "grocery", "utilities", "rent"]:
+    elif category in EXPENSE_CATEGORIES:
         expense_score += 2
     
     # Return the type with higher score
@@ -265,35 +366,99 @@ def detect_type(text: str) -> str:
     
     return "unknown"
 
-def parse_text_message(text: str, source: str = "text") -> Dict:
+def detect_category(text: str) -> str:
     """
-    Enhanced text parsing with comprehensive data extraction.
+    Enhanced category detection with weighted scoring.
     """
     if not text:
-        text = ""
+        return "uncategorized"
     
-    # Extract components
-    amount = extract_amount(text)
-    date = extract_date(text) or datetime.utcnow()
-    category = detect_category(text)
-    transaction_type = detect_type(text)
+    return _score_category(text.lower())
+
+def detect_type(text: str) -> str:
+    """
+    Enhanced transaction type detection.
+    """
+    if not text:
+        return "unknown"
+    
+    text_lower = text.lower()
+    return _score_type(text_lower, _score_category(text_lower))
+
+@lru_cache(maxsize=4096)
+def _parse_core(text_key: str, today: date) -> Tuple[Optional[datetime], str, str, Optional[float], float]:
+    """
+    Pure parsing step, memoized on the normalized (cleaned, lowercased) text.
+    `today` is part of the cache key so relative dates never go stale overnight.
+    Returns (date, type, category, amount, confidence_score).
+    """
+    # Extract components; text_key is already clean and lowercase
+    amount = extract_amount(text_key, text_clean=text_key, text_lower=text_key)
+    parsed_date = extract_date(text_key, text_lower=text_key)
+    
+    # One keyword pass for category; type reuses it
+    category = _score_category(text_key)
+    transaction_type = _score_type(text_key, category)
     
     # Additional metadata
-    confidence_score = calculate_confidence_score(text, amount, category, transaction_type)
-    
-    parsed_data = {
-        "date": date,
-        "type": transaction_type,
-        "category": category,
-        "amount": amount,
-        "raw_text": text.strip(),
-        "source": source,
-        "ingested_at": datetime.utcnow(),
-        "confidence_score": confidence_score,
-        "parser_version": "2.0"
-    }
-    
-    return parsed_data
+    confidence_score = calculate_confidence_score(text_key, amount, category, transaction_type)
+    
+    return parsed_date, transaction_type, category, amount, confidence_score
+
+@dataclass(frozen=True, slots=True)
+class ParsedMessage:
+    """
+    Structured result of parsing a single message.
+    """
+    date: datetime
+    type: str
+    category: str
+    amount: Optional[float]
+    raw_text: str
+    source: str
+    ingested_at: datetime
+    confidence_score: float
+    parser_version: str = "2.0"
+    
+    def to_dict(self) -> Dict:
+        """
+        Plain dict form for the MongoDB layer.
+        """
+        return {
+            "date": self.date,
+            "type": self.type,
+            "category": self.category,
+            "amount": self.amount,
+            "raw_text": self.raw_text,
+            "source": self.source,
+            "ingested_at": self.ingested_at,
+            "confidence_score": self.confidence_score,
+            "parser_version": self.parser_version
+        }
+
+def parse_text_message(text: str, source: str = "text") -> ParsedMessage:
+    """
+    Enhanced text parsing with comprehensive data extraction.
+    """
+    if not text:
+        text = ""
+    
+    # Prepare the text once and share it with every extractor
+    raw_text = clean_text(text)
+    date, transaction_type, category, amount, confidence_score = _parse_core(
+        raw_text.lower(), datetime.now().date()
+    )
+    
+    return ParsedMessage(
+        date=date or datetime.utcnow(),
+        type=transaction_type,
+        category=category,
+        amount=amount,
+        raw_text=raw_text,
+        source=source,
+        ingested_at=datetime.utcnow(),
+        confidence_score=confidence_score
+    )
 
 def calculate_confidence_score(text: str, amount: float, category: str, transaction_type: str) -> float:
     """
@@ -313,8 +478,8 @@ def calculate_confidence_score(text: str, amount: float, category: str, transact
     if transaction_type != "unknown":
         score += 0.3
     
-    # Text quality (length and structure)
-    if text and len(text.split()) >= 3:
+    # Text quality (length and structure); maxsplit stops after 3 words
+    if text and len(text.split(maxsplit=2)) >= 3:
         score += 0.1
     
     # Cap at 1.0
@@ -324,43 +489,46 @@ def extract_amount_from_query(text: str) -> float:
     """
     Enhanced amount extraction for query contexts (e.g., "what if I hire 15k").
     """
-    amount = extract_amount(text)
+    low = text.lower()
+    
+    # Without a digit only spelled-out amounts ("five thousand") can match
+    if not _DIGIT_RE.search(text):
+        return extract_amount_from_words(text, low) or 0.0
+    
+    amount = extract_amount(text, text_lower=low)
     if amount is not None:
         return amount
     
     # Look for patterns like "15k", "20K", "1.5L"
-    k_pattern = re.search(r'(\d+(?:\.\d+)?)\s*[kK]', text)
-    if k_pattern:
+    if 'k' in low and (k_pattern := _K_RE.search(low)):
         return float(k_pattern.group(1)) * 1000.0
     
     # Look for lakh patterns
-    l_pattern = re.search(r'(\d+(?:\.\d+)?)\s*[lL]', text)
-    if l_pattern:
+    if 'l' in low and (l_pattern := _L_RE.search(low)):
         return float(l_pattern.group(1)) * 100000.0
     
     # Look for crore patterns
-    c_pattern = re.search(r'(\d+(?:\.\d+)?)\s*[cC]', text)
-    if c_pattern:
+    if 'c' in low and (c_pattern := _C_RE.search(low)):
         return float(c_pattern.group(1)) * 10000000.0
     
     return 0.0
 
-def validate_parsed_data(parsed_data: Dict) -> List[str]:
+def validate_parsed_data(parsed_data: ParsedMessage) -> List[str]:
     """
     Validate parsed data and return list of warnings/issues.
     """
     warnings = []
     
-    if not parsed_data.get("amount") or parsed_data["amount"] <= 0:
+    if not parsed_data.amount or parsed_data.amount <= 0:
         warnings.append("No valid amount detected")
     
-    if parsed_data.get("type") == "unknown":
+    if parsed_data.type == "unknown":
         warnings.append("Transaction type could not be determined")
     
-    if parsed_data.get("category") == "uncategorized":
+    if parsed_data.category == "uncategorized":
         warnings.append("Transaction category could not be determined")
     
-    if parsed_data.get("confidence_score", 0) < 0.5:
+    if parsed_data.confidence_score < 0.5:
         warnings.append("Low confidence in parsed data")
     
     return warnings
\ No newline at end of file
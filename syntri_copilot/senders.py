@@ -1,8 +1,17 @@
 # senders.py
 import os
+import re
 import time
+import string
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from twilio.base.exceptions import TwilioException
 
 load_dotenv()
@@ -11,19 +20,65 @@ TW_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TW_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TW_FROM = os.getenv("TWILIO_WHATSAPP_NUMBER")  # e.g. whatsapp:+14155238886
 
-# Initialize Twilio client with better error handling
-tw_client = None
-if TW_SID and TW_TOKEN:
+logger = logging.getLogger(__name__)
+
+_WA_RE = re.compile(r'whatsapp:\+\d{10,15}')
+
+# Deletes every ASCII character except digits and '+'
+_PHONE_KEEP = set(string.digits + '+')
+_PHONE_DELETE_TABLE = str.maketrans('', '', ''.join(chr(i) for i in range(128) if chr(i) not in _PHONE_KEEP))
+
+def _pooled_http_client() -> TwilioHttpClient:
+    """
+    Twilio HTTP client backed by one keep-alive session, so message sends
+    reuse pooled TCP+TLS connections to api.twilio.com.
+    """
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    http_client = TwilioHttpClient(pool_connections=True)
+    http_client.session = session
+    return http_client
+
+@lru_cache(maxsize=1)
+def _get_client() -> Optional[Client]:
+    """
+    Create the Twilio client on first use rather than at import, so startup
+    doesn't pay for it. Returns None (development mode) without credentials.
+    """
+    if not TW_SID or not TW_TOKEN:
+        logger.warning("⚠️ Twilio credentials not found. Running in development mode.")
+        return None
+    
     try:
-        tw_client = Client(TW_SID, TW_TOKEN)
-        # Test the connection
-        account = tw_client.api.account.fetch()
-        print(f"✅ Twilio connected successfully. Account: {account.friendly_name}")
+        return Client(TW_SID, TW_TOKEN, http_client=_pooled_http_client())
     except Exception as e:
-        print(f"❌ Twilio initialization error: {e}")
-        tw_client = None
-else:
-    print("⚠️ Twilio credentials not found. Running in development mode.")
+        logger.error("❌ Twilio initialization error: %s", e)
+        return None
+
+ACCOUNT_CACHE_TTL = 300  # seconds
+BULK_SEND_WORKERS = 8
+WA_BODY_LIMIT = 1600  # WhatsApp limit is ~1600 chars
+_WA_MAX_LEN = WA_BODY_LIMIT - 10  # leaves room for the "..." suffix
+
+# Cache for the Twilio account lookup
+_account_cache = {
+    "account": None,
+    "fetched_at": 0
+}
+
+def fetch_account():
+    """
+    Fetch the Twilio account, reusing the result for ACCOUNT_CACHE_TTL seconds.
+    """
+    current_time = time.monotonic()
+    if (_account_cache["account"] is not None and
+        current_time - _account_cache["fetched_at"] < ACCOUNT_CACHE_TTL):
+        return _account_cache["account"]
+    
+    account = _get_client().api.account.fetch()
+    _account_cache["account"] = account
+    _account_cache["fetched_at"] = current_time
+    return account
 
 def send_whatsapp(to_number: str, body: str, max_retries: int = 3) -> str:
     """
@@ -37,28 +92,27 @@ def send_whatsapp(to_number: str, body: str, max_retries: int = 3) -> str:
     Returns:
         Message SID if successful, None if failed
     """
+    # Validate message content first; it needs nothing but the body
+    if not body or not body.strip():
+        logger.warning("⚠️ Empty message body, skipping send")
+        return None
+    
+    # Truncate long messages
+    if len(body) > WA_BODY_LIMIT:
+        body = body[:_WA_MAX_LEN] + "..."
+        logger.debug("✂️ Message truncated to fit WhatsApp limits")
+    
+    tw_client = _get_client()
     if not tw_client or not TW_FROM:
         # Development fallback
-        print(f"🔧 [DEV MODE] Would send to {to_number}:")
-        print(f"📄 Message: {body}")
-        print("---")
+        logger.info("🔧 [DEV MODE] Would send to %s:\n📄 Message: %s", to_number, body)
         return "dev_mode_message_id"
     
     # Ensure proper WhatsApp format
     if not to_number.startswith('whatsapp:'):
-        print(f"⚠️ Invalid WhatsApp number format: {to_number}")
-        return None
-    
-    # Validate message content
-    if not body or len(body.strip()) == 0:
-        print("⚠️ Empty message body, skipping send")
+        logger.warning("⚠️ Invalid WhatsApp number format: %s", to_number)
         return None
     
-    # Truncate long messages
-    if len(body) > 1600:  # WhatsApp limit is ~1600 chars
-        body = body[:1590] + "..."
-        print("✂️ Message truncated to fit WhatsApp limits")
-    
     for attempt in range(max_retries):
         try:
             message = tw_client.messages.create(
@@ -67,55 +121,53 @@ def send_whatsapp(to_number: str, body: str, max_retries: int = 3) -> str:
                 to=to_number
             )
             
-            print(f"✅ WhatsApp message sent successfully!")
-            print(f"📱 To: {to_number}")
-            print(f"🆔 SID: {message.sid}")
-            print(f"📊 Status: {message.status}")
+            logger.debug("✅ WhatsApp message sent to %s (SID: %s, status: %s)",
+                         to_number, message.sid, message.status)
             
             return message.sid
             
         except TwilioException as e:
-            print(f"❌ Twilio error (attempt {attempt + 1}/{max_retries}): {e}")
+            logger.warning("❌ Twilio error (attempt %d/%d): %s", attempt + 1, max_retries, e)
             
             # Handle specific Twilio errors
             if e.code == 20003:  # Authentication error
-                print("🔑 Authentication failed. Check TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN")
+                logger.error("🔑 Authentication failed. Check TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN")
                 break
             elif e.code == 21211:  # Invalid 'To' phone number
-                print("📞 Invalid phone number format")
+                logger.error("📞 Invalid phone number format")
                 break
             elif e.code == 21610:  # Message exceeds character limit
-                print("📝 Message too long")
+                logger.error("📝 Message too long")
                 break
             elif e.code in [21617, 21618]:  # WhatsApp number not enabled
-                print("📱 WhatsApp not enabled for this number")
+                logger.error("📱 WhatsApp not enabled for this number")
                 break
             elif e.code == 21614:  # 'To' number is not a valid mobile number
-                print("📱 Not a valid mobile number for WhatsApp")
+                logger.error("📱 Not a valid mobile number for WhatsApp")
                 break
             
             # Rate limiting - wait and retry
             if e.code == 20429:
                 wait_time = min(2 ** attempt, 10)  # Exponential backoff, max 10s
-                print(f"⏱️ Rate limited, waiting {wait_time}s before retry...")
+                logger.warning("⏱️ Rate limited, waiting %ss before retry...", wait_time)
                 time.sleep(wait_time)
                 continue
             
             # For other errors, wait a bit before retrying
             if attempt < max_retries - 1:
                 wait_time = min(2 ** attempt, 5)
-                print(f"⏱️ Waiting {wait_time}s before retry...")
+                logger.info("⏱️ Waiting %ss before retry...", wait_time)
                 time.sleep(wait_time)
         
         except Exception as e:
-            print(f"❌ Unexpected error (attempt {attempt + 1}/{max_retries}): {e}")
+            logger.warning("❌ Unexpected error (attempt %d/%d): %s", attempt + 1, max_retries, e)
             
             if attempt < max_retries - 1:
                 wait_time = min(2 ** attempt, 5)
-                print(f"⏱️ Waiting {wait_time}s before retry...")
+                logger.info("⏱️ Waiting %ss before retry...", wait_time)
                 time.sleep(wait_time)
     
-    print(f"❌ Failed to send message after {max_retries} attempts")
+    logger.error("❌ Failed to send message after %d attempts", max_retries)
     return None
 
 def validate_whatsapp_number(number: str) -> bool:
@@ -128,26 +180,8 @@ def validate_whatsapp_number(number: str) -> bool:
     Returns:
         True if valid format, False otherwise
     """
-    if not number:
-        return False
-    
-    # Must start with 'whatsapp:'
-    if not number.startswith('whatsapp:'):
-        return False
-    
-    # Extract the phone number part
-    phone_part = number[9:]  # Remove 'whatsapp:' prefix
-    
-    # Must start with '+'
-    if not phone_part.startswith('+'):
-        return False
-    
-    # Must have at least 10 digits after the '+'
-    digits = phone_part[1:]  # Remove '+' prefix
-    if len(digits) < 10 or not digits.isdigit():
-        return False
-    
-    return True
+    # 'whatsapp:+' followed by 10-15 digits (E.164), checked in one regex pass
+    return bool(number and _WA_RE.fullmatch(number))
 
 def format_whatsapp_number(number: str) -> str:
     """
@@ -166,8 +200,11 @@ def format_whatsapp_number(number: str) -> str:
     if number.startswith('whatsapp:+'):
         return number if validate_whatsapp_number(number) else None
     
-    # Remove any non-digit characters except '+'
-    cleaned = ''.join(c for c in number if c.isdigit() or c == '+')
+    # Remove any non-digit characters except '+' (ASCII table in C; rare
+    # non-ASCII input such as no-break spaces takes the per-character path)
+    cleaned = number.translate(_PHONE_DELETE_TABLE)
+    if not cleaned.isascii():
+        cleaned = ''.join(c for c in cleaned if c.isdigit() or c == '+')
     
     # Add '+' if missing
     if not cleaned.startswith('+'):
@@ -199,13 +236,32 @@ def send_whatsapp_safe(to_number: str, body: str) -> bool:
     # Format the number
     formatted_number = format_whatsapp_number(to_number)
     if not formatted_number:
-        print(f"❌ Invalid phone number format: {to_number}")
+        logger.warning("❌ Invalid phone number format: %s", to_number)
         return False
     
     # Send the message
     message_sid = send_whatsapp(formatted_number, body)
     return message_sid is not None
 
+def send_whatsapp_bulk(messages: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """
+    Send several WhatsApp messages concurrently.
+    
+    Sends are network-bound, so a thread pool overlaps the Twilio round-trips
+    instead of paying them one after another.
+    
+    Args:
+        messages: (to_number, body) pairs
+    
+    Returns:
+        Message SID (or None on failure) for each pair, in input order
+    """
+    if not messages:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=min(BULK_SEND_WORKERS, len(messages))) as pool:
+        return list(pool.map(lambda msg: send_whatsapp(*msg), messages))
+
 def get_twilio_status() -> dict:
     """
     Get the current status of Twilio configuration.
@@ -214,15 +270,16 @@ def get_twilio_status() -> dict:
         Dictionary with configuration status
     """
     status = {
-        "configured": tw_client is not None,
+        "configured": _get_client() is not None,
         "account_sid": TW_SID[:10] + "..." if TW_SID else None,
         "from_number": TW_FROM,
         "client_ready": False
     }
     
-    if tw_client:
+    if status["configured"]:
         try:
-            account = tw_client.api.account.fetch()
+            # Connection check (cached for ACCOUNT_CACHE_TTL)
+            account = fetch_account()
             status["client_ready"] = True
             status["account_name"] = getattr(account, 'friendly_name', 'Unknown')
             status["account_status"] = getattr(account, 'status', 'Unknown')
@@ -1,12 +1,39 @@
 # watsonx_client.py
 import os
-import json
-import requests
+import re
+import orjson
+import atexit
+import asyncio
+import bisect
+import logging
+import queue
+import random
+import hashlib
+import itertools
+import threading
+import weakref
+import httpx
 from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
 import time
 
 load_dotenv()
 
+# Log through a queue so formatting and stream writes happen on the
+# listener thread, not on the request path
+logger = logging.getLogger(__name__)
+_log_queue = queue.Queue(-1)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = QueueListener(_log_queue, _log_stream_handler)
+logger.addHandler(QueueHandler(_log_queue))
+logger.propagate = False
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 # Environment variables
 WATSONX_API_KEY = os.getenv("WATSONX_APIKEY")
 WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID")
@@ -21,70 +48,292 @@ WATSONX_URLS = {
     "eu-de": "https://eu-de.ml.cloud.ibm.com/ml/v1/text/generation"
 }
 
+# Resolve the generation endpoint once; a bad region is reported loudly at
+# startup instead of every message quietly falling back to raw text
+try:
+    API_URL: Optional[str] = WATSONX_URLS[WATSONX_REGION]
+except KeyError:
+    logger.error("❌ Invalid Watsonx region: %s (expected one of: %s) - polishing disabled",
+                 WATSONX_REGION, ", ".join(WATSONX_URLS))
+    API_URL = None
+
+@dataclass(frozen=True, slots=True)
+class _Cfg:
+    """
+    Watsonx settings resolved once at import.
+    """
+    api_url: Optional[str]
+    stream_url: Optional[str]
+    model_id: str
+    project_id: str
+    api_key: str
+
+_CFG = _Cfg(
+    api_url=API_URL,
+    stream_url=API_URL.replace("/text/generation", "/text/generation_stream") if API_URL else None,
+    model_id=WATSONX_MODEL_ID,
+    project_id=WATSONX_PROJECT_ID or "",
+    api_key=WATSONX_API_KEY or ""
+)
+
 WATSONX_AUTH_URL = f"https://iam.cloud.ibm.com/identity/token"
 TIMEOUT = 30  # seconds
 
+# One pooled HTTP/2 client for the IAM and generation hosts: repeat calls
+# reuse the TLS connection and concurrent polishes multiplex over it
+_CLIENT = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+    timeout=TIMEOUT,
+    headers={"Accept": "application/json"}
+)
+atexit.register(_CLIENT.close)
+
+# Async client for concurrent polishing from the event loop
+_ACLIENT_KWARGS = {
+    "http2": True,
+    "limits": httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    "timeout": TIMEOUT,
+    "headers": {"Accept": "application/json"}
+}
+_ACLIENT = httpx.AsyncClient(**_ACLIENT_KWARGS)
+
+# Transient failures worth retrying before falling back to raw text
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.4  # seconds, doubled per attempt and jittered
+RETRY_MAX_DELAY = 10  # seconds, caps a server-sent Retry-After
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """
+    Seconds to wait before the next attempt: the server's Retry-After if it
+    sent one, otherwise jittered exponential backoff.
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), RETRY_MAX_DELAY)
+    return RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+def _send_with_retry(method: str, url: str, *, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    Send a request on the shared client, retrying connection failures and
+    429/5xx responses. The last response is returned as-is for the caller's
+    raise_for_status().
+    """
+    request = _CLIENT.build_request(method, url, **kwargs)
+    for attempt in range(RETRY_TOTAL + 1):
+        try:
+            response = _CLIENT.send(request, stream=stream)
+        except _RETRY_ERRORS as e:
+            if attempt == RETRY_TOTAL:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning("🔁 Watsonx connection failed (%s), retrying in %.1fs", e, delay)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                return response
+            delay = _retry_delay(attempt, response)
+            response.close()
+            logger.warning("🔁 Watsonx returned %d, retrying in %.1fs", response.status_code, delay)
+        time.sleep(delay)
+
+async def _asend_with_retry(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Async counterpart of _send_with_retry.
+    """
+    request = client.build_request(method, url, **kwargs)
+    for attempt in range(RETRY_TOTAL + 1):
+        try:
+            response = await client.send(request)
+        except _RETRY_ERRORS as e:
+            if attempt == RETRY_TOTAL:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning("🔁 Watsonx connection failed (%s), retrying in %.1fs", e, delay)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                return response
+            delay = _retry_delay(attempt, response)
+            await response.aclose()
+            logger.warning("🔁 Watsonx returned %d, retrying in %.1fs", response.status_code, delay)
+        await asyncio.sleep(delay)
+
+# Polished replies keyed by (model, normalized text) so repeated templated
+# messages skip the API round trip; oldest entries are evicted past the cap
+POLISH_CACHE_MAX = 1024
+POLISH_CACHE_TTL = 3600  # seconds
+_POLISH_CACHE: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+_polish_cache_lock = threading.Lock()
+
 # Cache for access token
 _access_token_cache = {
     "token": None,
     "expires_at": 0
 }
 
-def get_access_token() -> str:
+# Only one thread refreshes the shared token at a time
+_token_lock = threading.Lock()
+
+# Rotate the token this long before it expires, off the request path
+TOKEN_REFRESH_LEAD = 600  # seconds
+TOKEN_EXPIRY_MARGIN = 60  # seconds
+_refresh_timer: Optional[threading.Timer] = None
+
+# One refresh lock per event loop so a cold burst fetches a single token
+_token_alocks = weakref.WeakKeyDictionary()
+
+def _cached_token() -> Optional[str]:
     """
-    Get IBM Cloud IAM access token for Watsonx authentication.
-    Implements token caching to avoid repeated authentication calls.
+    Return the cached token if still valid; expires_at already has the
+    safety margin taken off.
     """
-    current_time = time.time()
-    
-    # Return cached token if still valid (with 5-minute buffer)
-    if (_access_token_cache["token"] and 
-        current_time < (_access_token_cache["expires_at"] - 300)):
+    if (_access_token_cache["token"] and
+        time.monotonic() < _access_token_cache["expires_at"]):
         return _access_token_cache["token"]
-    
-    if not WATSONX_API_KEY:
+    return None
+
+def _token_request_data() -> dict:
+    """
+    Form body for the IAM token request.
+    """
+    if not _CFG.api_key:
         raise ValueError("WATSONX_APIKEY environment variable not set")
     
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json"
-    }
-    
-    data = {
+    return {
         "grant_type": "urn:iam:params:oauth:grant-type:apikey",
-        "apikey": WATSONX_API_KEY
+        "apikey": _CFG.api_key
     }
+
+def _store_token(token_data: dict) -> str:
+    """
+    Validate an IAM token response and cache the token.
+    Raises KeyError if the response has no access token.
+    """
+    access_token = token_data["access_token"]
+    expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
+    
+    if not access_token:
+        raise ValueError("No access token in response")
+    
+    # Cache the token on the monotonic clock (immune to wall-clock jumps),
+    # treating its last minute as already expired
+    _access_token_cache["token"] = access_token
+    _access_token_cache["expires_at"] = time.monotonic() + expires_in - TOKEN_EXPIRY_MARGIN
+    
+    _schedule_refresh(expires_in)
+    
+    logger.info("✅ Successfully obtained Watsonx access token")
+    return access_token
+
+def _schedule_refresh(expires_in: float) -> None:
+    """
+    (Re)arm the daemon timer that rotates the token before it expires.
+    """
+    global _refresh_timer
+    if _refresh_timer:
+        _refresh_timer.cancel()
+    _refresh_timer = threading.Timer(max(expires_in - TOKEN_REFRESH_LEAD, 60), _refresh_in_background)
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+
+def _refresh_in_background() -> None:
+    """
+    Fetch a fresh token while the current one is still valid; a successful
+    fetch schedules the next rotation.
+    """
+    try:
+        with _token_lock:
+            _fetch_access_token()
+    except Exception as e:
+        # Leave the lazy refresh in get_access_token as the fallback
+        logger.warning("⚠️ Background Watsonx token refresh failed: %s", e)
+
+def _cancel_refresh() -> None:
+    """
+    Stop the pending token rotation at interpreter exit.
+    """
+    if _refresh_timer:
+        _refresh_timer.cancel()
+
+atexit.register(_cancel_refresh)
+
+def get_access_token() -> str:
+    """
+    Get IBM Cloud IAM access token for Watsonx authentication.
+    Implements token caching to avoid repeated authentication calls.
+    """
+    token = _cached_token()
+    if token:
+        return token
+    
+    with _token_lock:
+        # Another thread may have refreshed while we waited
+        token = _cached_token()
+        if token:
+            return token
+        return _fetch_access_token()
+
+def _fetch_access_token() -> str:
+    """
+    Request a new IAM token and cache it; callers hold _token_lock.
+    """
+    data = _token_request_data()
     
     try:
-        response = requests.post(
-            WATSONX_AUTH_URL,
-            headers=headers,
-            data=data,
-            timeout=TIMEOUT
-        )
+        # Form-encoded body; httpx sets the Content-Type
+        response = _send_with_retry("POST", WATSONX_AUTH_URL, data=data)
         response.raise_for_status()
         
-        token_data = response.json()
-        access_token = token_data.get("access_token")
-        expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
-        
-        if not access_token:
-            raise ValueError("No access token in response")
+        return _store_token(orjson.loads(response.content))
         
-        # Cache the token
-        _access_token_cache["token"] = access_token
-        _access_token_cache["expires_at"] = current_time + expires_in
-        
-        print("✅ Successfully obtained Watsonx access token")
-        return access_token
-        
-    except requests.RequestException as e:
-        print(f"❌ Failed to get Watsonx access token: {e}")
+    except httpx.HTTPError as e:
+        logger.error("❌ Failed to get Watsonx access token: %s", e)
         raise
     except (KeyError, ValueError) as e:
-        print(f"❌ Invalid token response: {e}")
+        logger.error("❌ Invalid token response: %s", e)
         raise
 
+def _token_alock() -> asyncio.Lock:
+    """
+    Token refresh lock for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    lock = _token_alocks.get(loop)
+    if lock is None:
+        lock = _token_alocks[loop] = asyncio.Lock()
+    return lock
+
+async def get_access_token_async(client: Optional[httpx.AsyncClient] = None) -> str:
+    """
+    Async variant of get_access_token; concurrent callers share one refresh.
+    """
+    token = _cached_token()
+    if token:
+        return token
+    
+    async with _token_alock():
+        # Another coroutine may have refreshed while we waited
+        token = _cached_token()
+        if token:
+            return token
+        
+        data = _token_request_data()
+        
+        try:
+            response = await _asend_with_retry(client or _ACLIENT, "POST", WATSONX_AUTH_URL, data=data)
+            response.raise_for_status()
+            
+            return _store_token(orjson.loads(response.content))
+            
+        except httpx.HTTPError as e:
+            logger.error("❌ Failed to get Watsonx access token: %s", e)
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error("❌ Invalid token response: %s", e)
+            raise
+
 def test_watsonx_connection() -> bool:
     """
     Test the Watsonx connection and configuration.
@@ -93,106 +342,386 @@ def test_watsonx_connection() -> bool:
         token = get_access_token()
         return bool(token)
     except Exception as e:
-        print(f"❌ Watsonx connection test failed: {e}")
+        logger.error("❌ Watsonx connection test failed: %s", e)
         return False
 
-def polish_text(raw_text: str) -> str:
+def _polish_cache_key(raw_text: str) -> bytes:
     """
-    Enhanced text polishing using IBM Watsonx with proper authentication and error handling.
-    Falls back to raw text if Watsonx is unavailable.
+    Cache key for a message: model ID plus the trimmed, lowercased text.
+    """
+    normalized = raw_text.strip().lower()
+    return hashlib.blake2b(f"{_CFG.model_id}\0{normalized}".encode(), digest_size=16).digest()
+
+def _polish_cache_get(key: bytes) -> Optional[str]:
+    """
+    Return a cached polish that is still within its TTL.
+    """
+    with _polish_cache_lock:
+        entry = _POLISH_CACHE.get(key)
+        if entry is None:
+            return None
+        stored_at, polished = entry
+        if time.time() - stored_at > POLISH_CACHE_TTL:
+            del _POLISH_CACHE[key]
+            return None
+        _POLISH_CACHE.move_to_end(key)
+        return polished
+
+def _polish_cache_put(key: bytes, polished: str) -> None:
+    """
+    Store a polish, evicting the least recently used entries past the cap.
+    """
+    with _polish_cache_lock:
+        _POLISH_CACHE[key] = (time.time(), polished)
+        _POLISH_CACHE.move_to_end(key)
+        while len(_POLISH_CACHE) > POLISH_CACHE_MAX:
+            _POLISH_CACHE.popitem(last=False)
+
+def _polish_api_url(raw_text: str) -> Optional[str]:
+    """
+    Shared pre-checks for polishing; returns the API URL or None to skip.
     """
     # Quick validation
     if not raw_text or not raw_text.strip():
-        return raw_text
+        return None
     
     # Check if Watsonx is configured
-    if not WATSONX_API_KEY or not WATSONX_PROJECT_ID:
-        print("⚠️ Watsonx not configured - returning raw text")
+    if not _CFG.api_key or not _CFG.project_id:
+        logger.warning("⚠️ Watsonx not configured - returning raw text")
+        return None
+    
+    # Region was resolved (and reported if invalid) at import
+    return _CFG.api_url
+
+# Immutable parts of the generation request, built once; only the input
+# text changes per call
+_PROMPT_PREFIX = """Polish this business message for WhatsApp. Make it friendly, clear, and professional while keeping it concise:
+
+Original: """
+_PROMPT_SUFFIX = """
+
+Polished version:"""
+
+_STOP_SEQUENCES = ("\n\n", "Original:", "Polished version:", "Note:")
+_STOP_HOLDBACK = max(map(len, _STOP_SEQUENCES)) - 1
+# Client-side enforcement in one scan, in case the model runs past them
+_STOP_RE = re.compile("|".join(map(re.escape, _STOP_SEQUENCES)))
+
+_BASE_PARAMS = {
+    "decoding_method": "greedy",
+    "max_new_tokens": 200,
+    "min_new_tokens": 10,
+    "stop_sequences": list(_STOP_SEQUENCES),
+    "repetition_penalty": 1.1,
+    "temperature": 0.3
+}
+
+_BASE_PAYLOAD = {
+    "model_id": _CFG.model_id,
+    "parameters": _BASE_PARAMS,
+    "project_id": _CFG.project_id
+}
+
+def _build_payload(raw_text: str) -> dict:
+    """
+    Build the generation request body for a message.
+    """
+    # Enhanced prompt for better business communication
+    return {**_BASE_PAYLOAD, "input": _PROMPT_PREFIX + raw_text + _PROMPT_SUFFIX}
+
+def _extract_polished(data: dict, raw_text: str) -> str:
+    """
+    Pull the polished text out of a generation response.
+    """
+    if "results" in data and data["results"]:
+        result = data["results"][0]
+        return _finish_polish(result.get("generated_text", ""), raw_text)
+    else:
+        logger.warning("⚠️ Unexpected response format: %s", data)
         return raw_text
+
+def _finish_polish(generated_text: str, raw_text: str) -> str:
+    """
+    Validate and clean generated text, falling back to the original.
+    """
+    generated_text = generated_text.strip()
     
-    # Get the correct API URL
-    api_url = WATSONX_URLS.get(WATSONX_REGION)
-    if not api_url:
-        print(f"❌ Invalid Watsonx region: {WATSONX_REGION}")
+    if generated_text and len(generated_text) > 10:
+        # Clean up the generated text
+        polished = clean_generated_text(generated_text, raw_text)
+        logger.info("✅ Text polished successfully: %.50s...", polished)
+        return polished
+    else:
+        logger.warning("⚠️ Generated text too short, using original")
         return raw_text
+
+def _stream_generated(raw_text: str) -> Iterator[str]:
+    """
+    Yield generated text chunks from the SSE generation endpoint as they
+    arrive. Output is held back just enough to spot a stop sequence that
+    straddles chunks; on one, the stream is closed so the server stops too.
+    """
+    access_token = get_access_token()
     
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    body = orjson.dumps(_build_payload(raw_text))
+    
+    logger.info("🔄 Polishing text with Watsonx: %.50s...", raw_text)
+    
+    response = _send_with_retry("POST", _CFG.stream_url, stream=True, headers=headers, content=body)
     try:
-        # Get access token
-        access_token = get_access_token()
+        response.raise_for_status()
         
-        # Prepare the request
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+        generated = ""
+        emitted = 0
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            event_data = line[5:].strip()
+            if not event_data:
+                continue
+            results = orjson.loads(event_data).get("results")
+            if not results:
+                continue
+            generated += results[0].get("generated_text", "")
+            
+            if not emitted:
+                # Models often open with a blank line; skip leading whitespace
+                # so it isn't mistaken for the "\n\n" stop sequence
+                emitted = len(generated) - len(generated.lstrip())
+                if emitted == len(generated):
+                    emitted = 0
+                    continue
+            
+            # A stop sequence can only start at or after what was emitted
+            stop = _STOP_RE.search(generated, emitted)
+            if stop:
+                if stop.start() > emitted:
+                    yield generated[emitted:stop.start()]
+                return
+            
+            safe = len(generated) - _STOP_HOLDBACK
+            if safe > emitted:
+                yield generated[emitted:safe]
+                emitted = safe
         
-        # Enhanced prompt for better business communication
-        prompt = f"""Polish this business message for WhatsApp. Make it friendly, clear, and professional while keeping it concise:
+        if len(generated) > emitted:
+            yield generated[emitted:]
+    finally:
+        response.close()
 
-Original: {raw_text}
+def polish_text_stream(raw_text: str) -> Iterator[str]:
+    """
+    Stream the raw Watsonx generation for a message chunk by chunk.
+    Yields the original text instead if Watsonx is unavailable or fails
+    before producing anything.
+    """
+    if not _polish_api_url(raw_text):
+        yield raw_text
+        return
+    
+    produced = False
+    try:
+        for chunk in _stream_generated(raw_text):
+            produced = True
+            yield chunk
+    except Exception as e:
+        logger.error("❌ Watsonx streaming error: %s", e)
+        if not produced:
+            yield raw_text
 
-Polished version:"""
+def _report_http_error(e: Exception, status_code: int) -> None:
+    """
+    Log a Watsonx HTTP error with a hint for the common status codes.
+    """
+    logger.error("❌ Watsonx HTTP error: %s", e)
+    if status_code == 401:
+        logger.error("🔑 Authentication failed - check your API key")
+    elif status_code == 403:
+        logger.error("🚫 Access denied - check your project permissions")
+    elif status_code == 404:
+        logger.error("🔍 Resource not found - check your model ID and region")
+
+def polish_text(raw_text: str) -> str:
+    """
+    Enhanced text polishing using IBM Watsonx with proper authentication and error handling.
+    Falls back to raw text if Watsonx is unavailable.
+    """
+    if not _polish_api_url(raw_text):
+        return raw_text
+    
+    cache_key = _polish_cache_key(raw_text)
+    cached = _polish_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        # Collect the streamed generation; only real polishes are cached,
+        # not fallbacks
+        polished = _finish_polish("".join(_stream_generated(raw_text)), raw_text)
+        if polished != raw_text:
+            _polish_cache_put(cache_key, polished)
+        return polished
+            
+    except httpx.TimeoutException:
+        logger.warning("⏱️ Watsonx request timeout - using raw text")
+        return raw_text
+    except httpx.HTTPStatusError as e:
+        _report_http_error(e, e.response.status_code)
+        return raw_text
+    except Exception as e:
+        logger.error("❌ Unexpected Watsonx error: %s", e)
+        return raw_text
+
+# Statuses meaning the generation endpoint refused the array input itself
+BATCH_REJECTED_STATUSES = frozenset({400, 422})
+
+def polish_texts(raw_texts: List[str]) -> List[str]:
+    """
+    Polish several messages with one array-input generation request.
+    Cached messages skip the request and duplicates are sent once; if the
+    model rejects the batch, each message is polished on its own instead.
+    """
+    results = list(raw_texts)
+    pending: Dict[bytes, List[int]] = {}  # cache key -> indexes needing the API
+    for i, raw_text in enumerate(raw_texts):
+        if not _polish_api_url(raw_text):
+            continue
+        cache_key = _polish_cache_key(raw_text)
+        cached = _polish_cache_get(cache_key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(cache_key, []).append(i)
+    
+    if not pending:
+        return results
+    
+    try:
+        access_token = get_access_token()
+    except httpx.HTTPStatusError as e:
+        # Every per-message call would need the same token
+        _report_http_error(e, e.response.status_code)
+        return results
+    except Exception as e:
+        logger.error("❌ Watsonx authentication error: %s", e)
+        return results
+    
+    try:
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        body = orjson.dumps({
+            **_BASE_PAYLOAD,
+            "input": [_PROMPT_PREFIX + raw_texts[indexes[0]] + _PROMPT_SUFFIX for indexes in pending.values()]
+        })
+        
+        logger.info("🔄 Polishing %d texts with Watsonx in one request...", len(pending))
         
-        payload = {
-            "model_id": WATSONX_MODEL_ID,
-            "input": prompt,
-            "parameters": {
-                "decoding_method": "greedy",
-                "max_new_tokens": 200,
-                "min_new_tokens": 10,
-                "stop_sequences": ["\n\n", "Original:", "Polished version:", "Note:"],
-                "repetition_penalty": 1.1,
-                "temperature": 0.3
-            },
-            "project_id": WATSONX_PROJECT_ID
-        }
+        response = _send_with_retry("POST", _CFG.api_url, headers=headers, content=body)
+        response.raise_for_status()
         
-        print(f"🔄 Polishing text with Watsonx: {raw_text[:50]}...")
+        generated = orjson.loads(response.content).get("results") or []
+        if len(generated) != len(pending):
+            raise ValueError(f"expected {len(pending)} results, got {len(generated)}")
         
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=TIMEOUT
-        )
+    except httpx.TimeoutException:
+        logger.warning("⏱️ Watsonx request timeout - using raw text")
+        return results
+    except (httpx.HTTPStatusError, ValueError) as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in BATCH_REJECTED_STATUSES:
+            # Auth, permission and lookup errors, or a 5xx that outlived the
+            # retries, would fail the same way one by one
+            _report_http_error(e, e.response.status_code)
+            return results
+        # Array input not accepted (or malformed reply): go one by one
+        logger.warning("⚠️ Batch polish failed (%s), polishing individually", e)
+        for indexes in pending.values():
+            for i in indexes:
+                # Repeats are answered from the cache once the first succeeds
+                results[i] = polish_text(raw_texts[i])
+        return results
+    except Exception as e:
+        logger.error("❌ Unexpected Watsonx error: %s", e)
+        return results
+    
+    # Scatter each unique result back to every message that shared its key
+    for (cache_key, indexes), result in zip(pending.items(), generated):
+        polished = _finish_polish(result.get("generated_text", ""), raw_texts[indexes[0]])
+        if polished != raw_texts[indexes[0]]:
+            _polish_cache_put(cache_key, polished)
+            for i in indexes:
+                results[i] = polished
+    
+    return results
+
+async def polish_text_async(raw_text: str, client: Optional[httpx.AsyncClient] = None) -> str:
+    """
+    Non-blocking polish_text for use inside the event loop.
+    """
+    api_url = _polish_api_url(raw_text)
+    if not api_url:
+        return raw_text
+    
+    cache_key = _polish_cache_key(raw_text)
+    cached = _polish_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    client = client or _ACLIENT
+    
+    try:
+        access_token = await get_access_token_async(client)
+        
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        body = orjson.dumps(_build_payload(raw_text))
+        
+        logger.info("🔄 Polishing text with Watsonx: %.50s...", raw_text)
+        
+        response = await _asend_with_retry(client, "POST", api_url, headers=headers, content=body)
         response.raise_for_status()
         
-        # Parse response
-        data = response.json()
+        polished = _extract_polished(orjson.loads(response.content), raw_text)
+        if polished != raw_text:
+            _polish_cache_put(cache_key, polished)
+        return polished
         
-        if "results" in data and data["results"]:
-            result = data["results"][0]
-            generated_text = result.get("generated_text", "").strip()
-            
-            if generated_text and len(generated_text) > 10:
-                # Clean up the generated text
-                polished = clean_generated_text(generated_text, raw_text)
-                print(f"✅ Text polished successfully: {polished[:50]}...")
-                return polished
-            else:
-                print("⚠️ Generated text too short, using original")
-                return raw_text
-        else:
-            print(f"⚠️ Unexpected response format: {data}")
-            return raw_text
-            
-    except requests.exceptions.Timeout:
-        print("⏱️ Watsonx request timeout - using raw text")
+    except httpx.TimeoutException:
+        logger.warning("⏱️ Watsonx request timeout - using raw text")
         return raw_text
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ Watsonx HTTP error: {e}")
-        if e.response.status_code == 401:
-            print("🔑 Authentication failed - check your API key")
-        elif e.response.status_code == 403:
-            print("🚫 Access denied - check your project permissions")
-        elif e.response.status_code == 404:
-            print("🔍 Resource not found - check your model ID and region")
+    except httpx.HTTPStatusError as e:
+        _report_http_error(e, e.response.status_code)
         return raw_text
     except Exception as e:
-        print(f"❌ Unexpected Watsonx error: {e}")
+        logger.error("❌ Unexpected Watsonx error: %s", e)
         return raw_text
 
+async def polish_text_many(texts: List[str], client: Optional[httpx.AsyncClient] = None) -> List[str]:
+    """
+    Polish several messages concurrently; results keep the input order.
+    """
+    return list(await asyncio.gather(*(polish_text_async(t, client) for t in texts)))
+
+async def _polish_batch(texts: List[str]) -> List[str]:
+    # The shared _ACLIENT belongs to the server's loop, so a one-off
+    # asyncio.run() gets its own client that is closed with the loop
+    async with httpx.AsyncClient(**_ACLIENT_KWARGS) as client:
+        return await polish_text_many(texts, client)
+
+def polish_text_batch(texts: List[str]) -> List[str]:
+    """
+    Synchronous wrapper around polish_text_many for non-async callers.
+    """
+    return asyncio.run(_polish_batch(texts))
+
+async def close_watsonx_client() -> None:
+    """
+    Close the shared async client; call from the app's shutdown hook.
+    """
+    await _ACLIENT.aclose()
+
 def clean_generated_text(generated_text: str, original_text: str) -> str:
     """
     Clean and validate the generated text from Watsonx.
@@ -200,36 +729,42 @@ def clean_generated_text(generated_text: str, original_text: str) -> str:
     if not generated_text:
         return original_text
     
-    # Remove common artifacts
+    # Remove common artifacts, cutting at the first stop sequence
     cleaned = generated_text.strip()
+    stop = _STOP_RE.search(cleaned)
+    if stop:
+        cleaned = cleaned[:stop.start()]
     
-    # Remove repetitive patterns
+    # Remove repetitive patterns (set lookups keep this linear)
     lines = cleaned.split('\n')
+    seen = set()
     unique_lines = []
-    for line in lines:
-        line = line.strip()
-        if line and line not in unique_lines:
+    total_len = -1  # joined length: line lengths plus n - 1 newlines
+    for line in map(str.strip, lines):
+        if line and line not in seen:
+            seen.add(line)
             unique_lines.append(line)
-    
-    cleaned = '\n'.join(unique_lines)
+            total_len += len(line) + 1
+    total_len = max(total_len, 0)
     
     # If the result is too short or doesn't make sense, return original
-    if len(cleaned) < len(original_text) * 0.5:
+    # (decided before paying for the join)
+    if total_len < len(original_text) * 0.5:
         return original_text
     
+    cleaned = '\n'.join(unique_lines)
+    
     # If it's too long, truncate appropriately
-    if len(cleaned) > 1500:  # WhatsApp limit consideration
+    if total_len > 1500:  # WhatsApp limit consideration
         sentences = cleaned.split('. ')
-        truncated = []
-        current_length = 0
         
-        for sentence in sentences:
-            if current_length + len(sentence) > 1400:
-                break
-            truncated.append(sentence)
-            current_length += len(sentence) + 2
+        # Keep whole sentences up to ~1400 chars: each one costs its length
+        # plus the 2-char separator, and sentence i fits while its running
+        # total (separator included) stays within 1400 + 2
+        running = list(itertools.accumulate(len(sentence) + 2 for sentence in sentences))
+        cut = bisect.bisect_right(running, 1402)
         
-        cleaned = '. '.join(truncated)
+        cleaned = '. '.join(sentences[:cut])
         if not cleaned.endswith('.'):
             cleaned += '.'
     
@@ -245,7 +780,8 @@ def get_watsonx_status() -> dict:
         "project_id_set": bool(WATSONX_PROJECT_ID),
         "model_id": WATSONX_MODEL_ID,
         "region": WATSONX_REGION,
-        "api_url": WATSONX_URLS.get(WATSONX_REGION),
+        "api_url": API_URL,
+        "region_valid": API_URL is not None,
         "connection_tested": False
     }
     
@@ -257,6 +793,15 @@ def get_watsonx_status() -> dict:
     
     return status
 
+# Rule-based polishing tables
+_RUPEE_RE = re.compile(r'₹(\d+)')
+_SALES_KW = frozenset({"sales", "expenses", "net"})
+_EMOJI_PREFIXES = ("📊", "💰", "📈", "📉", "✅", "❌")
+
+# Below these sizes a message gains nothing from the LLM
+POLISH_MIN_CHARS = 20
+POLISH_MIN_SPACES = 3
+
 # Fallback polishing function using simple rules
 def simple_polish_text(raw_text: str) -> str:
     """
@@ -268,17 +813,17 @@ def simple_polish_text(raw_text: str) -> str:
     text = raw_text.strip()
     
     # Add appropriate emojis based on content
-    if "week" in text.lower() and any(word in text.lower() for word in ["sales", "expenses", "net"]):
+    lowered = text.lower()
+    if "week" in lowered and any(word in lowered for word in _SALES_KW):
         if not text.startswith("📊"):
             text = "📊 " + text
     
     if "₹" in text:
-        # Format numbers with proper spacing
-        import re
-        text = re.sub(r'₹(\d+)', r'₹\1', text)
+        # Group rupee amounts by thousands (₹12500 -> ₹12,500)
+        text = _RUPEE_RE.sub(lambda m: f"₹{int(m.group(1)):,}", text)
     
     # Capitalize first letter if needed
-    if text and not text[0].isupper() and not text.startswith(("📊", "💰", "📈", "📉", "✅", "❌")):
+    if text and not text[0].isupper() and not text.startswith(_EMOJI_PREFIXES):
         text = text[0].upper() + text[1:]
     
     return text
@@ -288,7 +833,12 @@ def polish_text_with_fallback(raw_text: str) -> str:
     """
     Try Watsonx polishing, fall back to simple polishing if it fails.
     """
-    if not WATSONX_API_KEY or not WATSONX_PROJECT_ID:
+    if not _CFG.api_key or not _CFG.project_id:
+        return simple_polish_text(raw_text)
+    
+    # Trivially short replies stay local
+    stripped = raw_text.strip() if raw_text else ""
+    if len(stripped) < POLISH_MIN_CHARS or stripped.count(' ') < POLISH_MIN_SPACES:
         return simple_polish_text(raw_text)
     
     try: